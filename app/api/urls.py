@@ -6,7 +6,6 @@ This module provides the GET /api/urls endpoint with pagination and sorting.
 
 import logging
 import math
-from datetime import datetime
 from enum import Enum
 
 from fastapi import APIRouter, HTTPException, Query, Request
@@ -84,10 +83,10 @@ async def list_urls(
         storage_service = request.app.state.storage_service
         logger.info(f"Fetching URLs - page: {page}, limit: {limit}, sort: {sort}")
         
-        # Get all URLs from storage service (with caching)
-        url_dict = storage_service.get_all_urls()
+        # Get the requested page from the storage service (sorted and cached there)
+        page_urls, total_count = storage_service.get_page(page, limit, sort.value)
         
-        if not url_dict:
+        if not total_count:
             logger.warning("No URLs found in storage")
             return PaginatedResponse[UrlListSummary](
                 success=True,
@@ -95,32 +94,14 @@ async def list_urls(
                 pagination=PaginationMeta.create(page=page, limit=limit, total_count=0)
             )
         
-        # Convert to list of ArchivedUrl objects
-        archived_urls = list(url_dict.values())
-        
-        # Apply sorting
-        if sort == SortOption.URL:
-            archived_urls.sort(key=lambda u: str(u.original_url).lower())
-        elif sort == SortOption.LAST_CAPTURED:
-            archived_urls.sort(key=lambda u: u.last_captured or datetime.min, reverse=True)
-        elif sort == SortOption.SNAPSHOT_COUNT:
-            archived_urls.sort(key=lambda u: u.snapshot_count, reverse=True)
-        
-        # Calculate pagination
-        total_count = len(archived_urls)
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        
         # Validate page bounds
+        start_idx = (page - 1) * limit
         if page > 1 and start_idx >= total_count:
             raise HTTPException(
                 status_code=400,
                 detail=f"Page {page} does not exist. Total pages: {math.ceil(total_count / limit)}"
             )
         
-        # Get page slice
-        page_urls = archived_urls[start_idx:end_idx]
-        
         # Convert to summary format
         url_summaries = [UrlListSummary.from_archived_url(url) for url in page_urls]
         
@@ -2,10 +2,10 @@
 Snapshot model for representing individual snapshots of archived URLs.
 """
 
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field, HttpUrl, field_validator, ConfigDict
+from typing import Dict, List, Optional, Any, Tuple
+from pydantic import BaseModel, Field, HttpUrl, PrivateAttr, field_validator, ConfigDict
 from .artifact import Artifact
 
 
@@ -60,6 +60,11 @@ class Snapshot(BaseModel):
         description="Detailed artifact information (populated when needed)"
     )
     
+    # (st_mtime_ns, st_size, st_ino) describing the snapshot's metadata.json
+    # and directory, recorded by the storage scan so HTTP cache headers don't
+    # need a stat per request
+    _stat_cache: Optional[Tuple[int, int, int]] = PrivateAttr(default=None)
+    
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
@@ -231,6 +236,19 @@ class Snapshot(BaseModel):
         """Check if specific artifact is available."""
         return artifact_type in self.available_artifacts
     
+    def etag(self) -> Optional[str]:
+        """Weak ETag from the stat recorded at scan time, or None if not scanned."""
+        if self._stat_cache is None:
+            return None
+        mtime_ns, size, inode = self._stat_cache
+        return f'W/"{inode:x}-{size:x}-{mtime_ns:x}"'
+    
+    def last_modified(self) -> Optional[datetime]:
+        """Modification time (UTC) recorded at scan time, or None if not scanned."""
+        if self._stat_cache is None:
+            return None
+        return datetime.fromtimestamp(self._stat_cache[0] / 1_000_000_000, timezone.utc)
+    
     @classmethod
     def from_scanner_result(cls, scanner_snapshot):
         """
@@ -3,8 +3,9 @@ ArchivedUrl model for representing archived URLs with their snapshots.
 """
 
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field, HttpUrl, field_validator, ConfigDict
+from operator import attrgetter
+from typing import Dict, List, Optional
+from pydantic import BaseModel, Field, HttpUrl, PrivateAttr, field_validator, ConfigDict
 from .snapshot import Snapshot
 
 
@@ -14,6 +15,10 @@ class ArchivedUrl(BaseModel):
     
     This model corresponds to a URL directory in the storage structure
     and contains all snapshots captured for that URL.
+    
+    Snapshots are kept sorted by timestamp, newest first. The ordering is
+    enforced on construction, so replace the list rather than mutating it
+    in place.
     """
     
     url_id: str = Field(
@@ -40,6 +45,10 @@ class ArchivedUrl(BaseModel):
         description="List of snapshots for this URL, sorted by timestamp (newest first)"
     )
     
+    # snapshot_id -> Snapshot index, built on first lookup for the current list
+    _by_id: Optional[Dict[str, Snapshot]] = PrivateAttr(default=None)
+    _by_id_source: Optional[List[Snapshot]] = PrivateAttr(default=None)
+    
     model_config = ConfigDict(
         json_schema_extra={
             "example": {
@@ -80,7 +89,7 @@ class ArchivedUrl(BaseModel):
     def sort_snapshots_by_timestamp(cls, v):
         """Ensure snapshots are sorted by timestamp (newest first)."""
         if v:
-            return sorted(v, key=lambda s: s.timestamp, reverse=True)
+            return sorted(v, key=attrgetter('timestamp'), reverse=True)
         return v
     
     @property
@@ -93,14 +102,14 @@ class ArchivedUrl(BaseModel):
         """Timestamp of the earliest snapshot."""
         if not self.snapshots:
             return None
-        return min(snapshot.timestamp for snapshot in self.snapshots)
+        return self.snapshots[-1].timestamp
     
     @property
     def last_captured(self) -> Optional[datetime]:
         """Timestamp of the most recent snapshot.""" 
         if not self.snapshots:
             return None
-        return max(snapshot.timestamp for snapshot in self.snapshots)
+        return self.snapshots[0].timestamp
     
     @property
     def date_range(self) -> Optional[str]:
@@ -119,11 +128,16 @@ class ArchivedUrl(BaseModel):
         return f"{first} to {last}"
     
     def get_snapshot_by_id(self, snapshot_id: str) -> Optional[Snapshot]:
-        """Find a snapshot by its ID."""
-        for snapshot in self.snapshots:
-            if snapshot.snapshot_id == snapshot_id:
-                return snapshot
-        return None
+        """
+        Find a snapshot by its ID.
+        
+        Uses a dict index built on the first call, so repeated lookups are
+        O(1). The index is rebuilt if the snapshots list is replaced.
+        """
+        if self._by_id is None or self._by_id_source is not self.snapshots:
+            self._by_id = {snapshot.snapshot_id: snapshot for snapshot in self.snapshots}
+            self._by_id_source = self.snapshots
+        return self._by_id.get(snapshot_id)
     
     def has_artifact_type(self, artifact_type: str) -> bool:
         """Check if any snapshot has the specified artifact type."""
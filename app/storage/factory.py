@@ -168,9 +168,24 @@ def _create_filesystem_provider(storage_config: Dict[str, Any]) -> FilesystemSto
     # Get timeout
     timeout_seconds = fs_config.get('timeout_seconds', 10)
     
+    # Whether to keep snapshots without a parsable folder timestamp
+    fallback_to_mtime = fs_config.get('fallback_to_mtime', False)
+    
+    # Threads scanning domain directories concurrently (None: provider default)
+    scan_workers = fs_config.get('scan_workers')
+    
+    # Cap on each per-snapshot scan cache (None: unbounded)
+    scan_cache_max_entries = fs_config.get('scan_cache_max_entries')
+    
     logger.info(f"Creating filesystem storage provider: path={storage_path}, timeout={timeout_seconds}s")
     
-    return FilesystemStorageProvider(storage_path, timeout_seconds)
+    return FilesystemStorageProvider(
+        storage_path,
+        timeout_seconds,
+        cache_max_entries=scan_cache_max_entries,
+        workers=scan_workers,
+        fallback_to_mtime=fallback_to_mtime
+    )
 
 
 def create_storage_service(config: Dict[str, Any], provider: Optional[StorageProvider] = None) -> StorageService:
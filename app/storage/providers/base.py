@@ -6,7 +6,7 @@ implementations must follow.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional, IO
+from typing import Any, Dict, Iterator, List, Optional, IO, Tuple
 from pathlib import Path
 
 from ...models.url import ArchivedUrl
@@ -121,6 +121,47 @@ class StorageProvider(ABC):
         """
         pass
 
+    def iter_urls(self) -> Iterator[Tuple[str, ArchivedUrl]]:
+        """
+        Iterate over all archived URLs.
+        
+        Providers that discover URLs incrementally should override this to
+        yield results as they are found; the default wraps get_all_urls().
+        
+        Yields:
+            (url_id, ArchivedUrl) tuples
+            
+        Raises:
+            StorageError: If storage operation fails
+        """
+        yield from self.get_all_urls().items()
+
+    def get_change_token(self) -> Optional[Any]:
+        """
+        Get a cheap token that changes whenever the stored URLs change.
+        
+        Callers compare tokens between calls to skip a full get_all_urls()
+        when nothing changed. Providers that can't detect changes cheaply
+        return None, which means "always rescan".
+        
+        Returns:
+            Hashable change token, or None if not supported
+        """
+        return None
+
+    def is_scan_complete(self) -> bool:
+        """
+        Check whether the last get_all_urls() scan saw the whole storage.
+        
+        A scan cut short (e.g. by a timeout) returns partial results; callers
+        must not pair those with a change token, or the partial results would
+        be reused until something changes.
+        
+        Returns:
+            True if the last scan ran to completion
+        """
+        return True
+
 
 class StorageError(Exception):
     """Exception raised for storage-related errors."""
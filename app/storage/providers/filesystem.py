@@ -5,20 +5,92 @@ This module contains the FilesystemStorageProvider that implements storage
 operations for local filesystem archives with integrated scanning functionality.
 """
 
-import json
+import errno
 import logging
+import mmap
+import os
+import re
+import sys
+import threading
 import time
-from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from datetime import datetime, timezone
+from functools import lru_cache
+from itertools import groupby
+from operator import attrgetter, itemgetter
 from pathlib import Path
-from typing import Dict, Optional, IO
+from typing import Any, Dict, Iterator, List, Optional, IO, Tuple, Union
 from urllib.parse import unquote
 
+import orjson
+
 from .base import StorageProvider, StorageError
 from ...models.url import ArchivedUrl
 from ...models.snapshot import Snapshot
 
 logger = logging.getLogger(__name__)
 
+# Artifact files recognised in a snapshot directory. Names are interned so the
+# copies stored on thousands of snapshots share one string object each.
+_KNOWN_ARTIFACTS = frozenset(
+    sys.intern(name) for name in ('archive.wacz', 'metadata.json', 'screenshot.png', 'singlefile.html')
+)
+
+# Buffer size for artifact streams; WACZ files are read front to back in large chunks
+_ARTIFACT_BUFFER_SIZE = 256 * 1024
+
+# os.sendfile errors meaning "not supported for these descriptors"; anything
+# else is a real I/O error
+_SENDFILE_FALLBACK_ERRNOS = frozenset(
+    getattr(errno, name) for name in ('EINVAL', 'ENOSYS', 'ENOTSOCK', 'EOPNOTSUPP', 'ENOTSUP')
+    if hasattr(errno, name)
+)
+
+# Prefix shared by all request snapshot folders
+_REQUEST_PREFIX = 'req_'
+
+# Upper bound for metadata.json reads; real metadata files are a few KB
+_METADATA_MAX_BYTES = 1 << 20
+
+# Metadata files at least this large are parsed straight from an mmap instead
+# of being copied into a bytes object first; below it mapping costs more than
+# the read it saves
+_METADATA_MMAP_MIN_BYTES = 64 * 1024
+
+# Snapshot folder names with a parsable timestamp, one alternative per
+# supported layout (matched against the whole name):
+# req_{request_id}_20240315_143022 and 20240315_143022, 20240315T143022Z, and
+# 2024-03-15_14-30-22. Each alternative has six groups; match.lastindex tells
+# which one matched. The scan also uses it to pick out request folders, so
+# this is the single definition of the folder layout.
+_TIMESTAMP_RE = re.compile(
+    r'(?:req_(?:.*_)?)?(\d{4})(\d{2})(\d{2})_(\d{2})(\d{2})(\d{2})'
+    r'|(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})Z'
+    r'|(\d{4})-(\d{2})-(\d{2})_(\d{2})-(\d{2})-(\d{2})',
+    re.ASCII
+)
+
+@lru_cache(maxsize=8192)
+def _parse_folder_timestamp(folder_name: str) -> Optional[datetime]:
+    """
+    Parse timestamp string from a snapshot folder name.
+    
+    Memoized because the same folder names are parsed again on every rescan;
+    call _parse_folder_timestamp.cache_clear() to reset it.
+    """
+    match = _TIMESTAMP_RE.fullmatch(folder_name)
+    if match:
+        fields = match.groups()[match.lastindex - 6:match.lastindex]
+        try:
+            return datetime(*map(int, fields))
+        except ValueError:
+            # Digits in the right places but not a real date (e.g. month 13)
+            pass
+    
+    logger.warning(f"Could not parse timestamp from folder: {folder_name}")
+    return None
+
 
 class FilesystemStorageProvider(StorageProvider):
     """
@@ -28,24 +100,112 @@ class FilesystemStorageProvider(StorageProvider):
     local filesystem with integrated directory scanning functionality.
     """
 
-    def __init__(self, storage_path: Path, timeout_seconds: int = 10):
+    def __init__(self, storage_path: Path, timeout_seconds: int = 10,
+                 cache_max_entries: Optional[int] = None, workers: Optional[int] = None,
+                 fallback_to_mtime: bool = False):
         """
         Initialize filesystem storage provider.
         
         Args:
             storage_path: Path to the archives directory
-            timeout_seconds: Maximum time to spend on operations
+            timeout_seconds: Maximum time to spend on operations (0 for no timeout)
+            cache_max_entries: Maximum entries kept in each per-file scan cache
+                (default: unbounded; entries for vanished snapshots are pruned
+                after every complete scan, so the caches track the archive size)
+            workers: Number of threads scanning domain directories concurrently
+                (default: min(32, cpu_count * 4))
+            fallback_to_mtime: Keep request folders whose name has no parsable
+                timestamp, using the directory mtime instead of skipping them
         """
         self.storage_path = Path(storage_path)
         self.timeout_seconds = timeout_seconds
+        self.cache_max_entries = cache_max_entries
+        self.workers = workers or min(32, (os.cpu_count() or 4) * 4)
+        self.fallback_to_mtime = fallback_to_mtime
         self._cached_results: Optional[Dict[str, ArchivedUrl]] = None
-        self._start_time = None
+        # snapshot_id -> Snapshot across all URLs, rebuilt with _cached_results
+        self._snapshot_index: Dict[str, Snapshot] = {}
+        # artifact name -> snapshot IDs that have it, rebuilt with the snapshot index
+        self._by_artifact: Dict[str, set] = {}
+        # Whether the last consumed scan finished before the timeout
+        self._scan_complete = False
+        self._start_time_ns: Optional[int] = None
+        self._deadline_ns: Optional[int] = None
+        
+        # Per-file scan caches: path -> (st_mtime_ns, value). An entry is only
+        # reused while the file (or directory) mtime is unchanged, so rescans
+        # skip re-reading metadata and re-listing artifacts for untouched snapshots.
+        self._metadata_cache: OrderedDict[str, Tuple[int, bytes]] = OrderedDict()
+        self._artifact_cache: OrderedDict[str, Tuple[int, List[str]]] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _cache_get(self, cache: OrderedDict, key: str, mtime_ns: int) -> Optional[Any]:
+        """Return a cached value if it was stored for the same mtime."""
+        entry = cache.get(key)
+        if entry is not None and entry[0] == mtime_ns:
+            return entry[1]
+        return None
+
+    def _cache_put(self, cache: OrderedDict, key: str, mtime_ns: int, value: Any) -> None:
+        """Store a value in a scan cache, evicting the oldest entries (FIFO) past the cap."""
+        with self._cache_lock:
+            cache[key] = (mtime_ns, value)
+            cache.move_to_end(key)
+            # A scan visits snapshots in the same order every time, so a cap
+            # below the snapshot count evicts each entry just before it is
+            # needed again; set one only to bound memory, not for speed
+            if self.cache_max_entries is not None:
+                while len(cache) > self.cache_max_entries:
+                    cache.popitem(last=False)
+
+    def invalidate(self, path: Union[str, Path]) -> None:
+        """
+        Drop cached scan data for a snapshot directory or metadata file.
+        
+        Callers that modify archives in place should call this so the next
+        scan re-reads the affected files even if their mtime did not change.
+        
+        Args:
+            path: Snapshot directory or metadata.json path
+        """
+        key = str(path)
+        with self._cache_lock:
+            self._metadata_cache.pop(key, None)
+            self._metadata_cache.pop(os.path.join(key, 'metadata.json'), None)
+            self._artifact_cache.pop(key, None)
+
+    def _prune_caches(self, live_dirs: set) -> None:
+        """
+        Drop cached entries for snapshot directories that were not seen in a scan.
+        
+        Args:
+            live_dirs: Snapshot directory paths (as strings) found by a complete scan
+        """
+        with self._cache_lock:
+            for key in [k for k in self._artifact_cache if k not in live_dirs]:
+                del self._artifact_cache[key]
+            for key in [k for k in self._metadata_cache if os.path.dirname(k) not in live_dirs]:
+                del self._metadata_cache[key]
+
+    def _start_deadline(self) -> None:
+        """Start the timeout clock for a tree walk (a scan or a change token)."""
+        # Integer monotonic deadline: cheap to compare and immune to clock jumps
+        self._start_time_ns = time.monotonic_ns()
+        self._deadline_ns = None
+        if self.timeout_seconds > 0:
+            self._deadline_ns = self._start_time_ns + int(self.timeout_seconds * 1_000_000_000)
 
     def _check_timeout(self) -> bool:
         """Check if scanning has exceeded timeout."""
-        if self._start_time is None:
+        if self._deadline_ns is None:
             return False
-        return time.time() - self._start_time > self.timeout_seconds
+        return time.monotonic_ns() > self._deadline_ns
+
+    def _remaining_time(self) -> Optional[float]:
+        """Seconds left before the scan timeout, or None if there is no timeout."""
+        if self._deadline_ns is None:
+            return None
+        return max(0.0, (self._deadline_ns - time.monotonic_ns()) / 1_000_000_000)
 
     def _parse_timestamp(self, folder_name: str) -> Optional[datetime]:
         """
@@ -53,42 +213,9 @@ class FilesystemStorageProvider(StorageProvider):
         
         Expected format: req_{request_id}_{YYYYMMDD_HHMMSS}
         """
-        try:
-            # Extract timestamp from request folder format: req_{request_id}_{YYYYMMDD_HHMMSS}
-            if folder_name.startswith('req_'):
-                parts = folder_name.split('_')
-                if len(parts) >= 3:
-                    # Get the last two parts as date and time
-                    date_part = parts[-2]  # YYYYMMDD
-                    time_part = parts[-1]  # HHMMSS
-                    timestamp_str = f"{date_part}_{time_part}"
-                    
-                    # Try to parse the extracted timestamp
-                    try:
-                        return datetime.strptime(timestamp_str, '%Y%m%d_%H%M%S')
-                    except ValueError:
-                        pass
-            
-            formats = [
-                '%Y%m%dT%H%M%SZ',  # 20240315T143022Z
-                '%Y%m%d_%H%M%S',   # 20240315_143022
-                '%Y-%m-%d_%H-%M-%S' # 2024-03-15_14-30-22
-            ]
-            
-            for fmt in formats:
-                try:
-                    return datetime.strptime(folder_name, fmt)
-                except ValueError:
-                    continue
-            
-            logger.warning(f"Could not parse timestamp from folder: {folder_name}")
-            return None
-            
-        except Exception as e:
-            logger.warning(f"Error parsing timestamp from {folder_name}: {e}")
-            return None
+        return _parse_folder_timestamp(folder_name)
 
-    def _parse_metadata_json(self, metadata_path: Path) -> Dict:
+    def _parse_metadata_json(self, metadata_path: Union[str, Path]) -> Dict:
         """
         Parse metadata.json file with error handling.
         
@@ -98,51 +225,156 @@ class FilesystemStorageProvider(StorageProvider):
         Returns:
             Dictionary containing metadata, or empty dict if parsing fails
         """
-        try:
-            if not metadata_path.exists():
-                logger.debug(f"Metadata file not found: {metadata_path}")
-                return {}
+        return self._load_metadata(metadata_path)[0]
+
+    def _load_metadata(self, metadata_path: Union[str, Path]) -> Tuple[Dict, Optional[os.stat_result]]:
+        """
+        Parse metadata.json and return it together with the file's stat.
+        
+        The stat is taken for the cache check anyway, so the scan reuses it
+        for ETag / Last-Modified instead of stat-ing the file again.
+        
+        Args:
+            metadata_path: Path to metadata.json file
             
-            with open(metadata_path, 'r', encoding='utf-8') as f:
-                metadata = json.load(f)
+        Returns:
+            (metadata, stat) tuple; metadata is an empty dict if parsing fails
+            and stat is None if the file could not be stat-ed
+        """
+        st = None
+        try:
+            cache_key = str(metadata_path)
+            st = os.stat(cache_key)
+            mtime_ns = st.st_mtime_ns
+            # The cache holds the raw JSON bytes rather than the parsed dict, so
+            # every caller gets its own objects and nested values can't leak
+            # between snapshots; re-parsing is far cheaper than a deepcopy
+            cached = self._cache_get(self._metadata_cache, cache_key, mtime_ns)
+            if cached is not None:
+                return orjson.loads(cached), st
+            
+            if st.st_size > _METADATA_MAX_BYTES:
+                logger.warning(f"Metadata file exceeds {_METADATA_MAX_BYTES} bytes: {metadata_path}")
+                return {}, st
+            
+            # Read raw bytes (no Python file object) so orjson can parse without
+            # a text-decode step: large files are parsed from a read-only mmap,
+            # small ones with a single os.read sized from the stat above
+            raw = None
+            fd = os.open(cache_key, os.O_RDONLY)
+            try:
+                if st.st_size >= _METADATA_MMAP_MIN_BYTES:
+                    with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                        with memoryview(mapped) as view:
+                            metadata = orjson.loads(view)
+                else:
+                    raw = os.read(fd, st.st_size)
+                    metadata = orjson.loads(raw)
+            finally:
+                os.close(fd)
             
             # Validate required fields
             if not isinstance(metadata, dict):
                 logger.warning(f"Invalid metadata format in {metadata_path}")
-                return {}
-            
-            return metadata
-            
-        except json.JSONDecodeError as e:
+                return {}, st
+            
+            # Mapped files are not cached: keeping a bytes copy of them would
+            # undo what the mmap saves
+            if raw is not None:
+                self._cache_put(self._metadata_cache, cache_key, mtime_ns, raw)
+            return metadata, st
+            
+        except FileNotFoundError:
+            logger.debug(f"Metadata file not found: {metadata_path}")
+            return {}, st
+        except orjson.JSONDecodeError as e:
             logger.warning(f"Invalid JSON in {metadata_path}: {e}")
-            return {}
+            return {}, st
         except Exception as e:
             logger.error(f"Error reading metadata {metadata_path}: {e}")
-            return {}
+            return {}, st
 
-    def _scan_snapshot_directory(self, snapshot_dir: Path, url_id: str) -> Optional[Snapshot]:
+    def _detect_artifacts(self, snapshot_dir: Union[str, Path],
+                          dir_entry: Optional[os.DirEntry] = None) -> List[str]:
+        """
+        Detect which known artifact files exist in a snapshot directory.
+        
+        Results are cached against the directory mtime, which changes whenever
+        an artifact file is added, removed or renamed.
+        
+        The directory mtime comes from the parent scandir's DirEntry when one
+        is passed. DirEntry caches its stat result, so it is fetched at most
+        once per scan even if the mtime fallback already asked for it. The
+        cached value reflects the directory at the time it was listed, which
+        is fine because a scan is a point-in-time snapshot anyway.
+        
+        Args:
+            snapshot_dir: Path to snapshot directory
+            dir_entry: Directory entry for snapshot_dir from the parent scandir, if available
+            
+        Returns:
+            List of available artifact file names
+        """
+        cache_key = str(snapshot_dir)
+        if dir_entry is not None:
+            mtime_ns = dir_entry.stat().st_mtime_ns
+        else:
+            mtime_ns = os.stat(cache_key).st_mtime_ns
+        cached = self._cache_get(self._artifact_cache, cache_key, mtime_ns)
+        if cached is not None:
+            return cached
+        
+        # One directory listing instead of an exists() stat per artifact name;
+        # DirEntry.is_file() answers from the readdir d_type without a stat
+        with os.scandir(cache_key) as entries:
+            available_artifacts = sorted(
+                sys.intern(entry.name) for entry in entries
+                if entry.name in _KNOWN_ARTIFACTS and entry.is_file()
+            )
+        
+        self._cache_put(self._artifact_cache, cache_key, mtime_ns, available_artifacts)
+        return available_artifacts
+
+    def _scan_snapshot_directory(self, snapshot_dir: Union[str, Path], url_id: str,
+                                 dir_entry: Optional[os.DirEntry] = None) -> Optional[Snapshot]:
         """
         Scan a single snapshot directory.
         
+        The scan passes plain string paths (DirEntry.path) so the hot loop
+        never builds Path objects; Path arguments are accepted as well.
+        
         Args:
             snapshot_dir: Path to snapshot directory
             url_id: URL identifier
+            dir_entry: Directory entry for snapshot_dir from the parent scandir, if available
             
         Returns:
             Snapshot object or None if parsing fails
         """
         try:
-            snapshot_id = snapshot_dir.name
+            snapshot_dir = os.fspath(snapshot_dir)
+            snapshot_id = dir_entry.name if dir_entry is not None else os.path.basename(snapshot_dir)
             
             # Parse timestamp from directory name
             timestamp = self._parse_timestamp(snapshot_id)
+            if not timestamp and self.fallback_to_mtime and dir_entry is not None:
+                # DirEntry caches its stat result, so this costs at most one call
+                mtime = dir_entry.stat().st_mtime
+                timestamp = datetime.fromtimestamp(mtime, timezone.utc).replace(tzinfo=None)
+                logger.debug(f"Using directory mtime as timestamp for snapshot: {snapshot_dir}")
+            
             if not timestamp:
                 logger.warning(f"Could not parse timestamp for snapshot: {snapshot_dir}")
                 return None
             
-            # Parse metadata.json
-            metadata_path = snapshot_dir / 'metadata.json'
-            metadata = self._parse_metadata_json(metadata_path)
+            # Check for available artifacts
+            available_artifacts = self._detect_artifacts(snapshot_dir, dir_entry)
+            
+            # Parse metadata.json; the directory listing above already tells us
+            # whether it exists, so missing files cost no stat/open probe
+            metadata, metadata_stat = {}, None
+            if 'metadata.json' in available_artifacts:
+                metadata, metadata_stat = self._load_metadata(os.path.join(snapshot_dir, 'metadata.json'))
             
             # Extract URL from metadata.archive_info.url (new structure)
             url = ''
@@ -160,73 +392,85 @@ class FilesystemStorageProvider(StorageProvider):
                 except Exception:
                     url = f'https://{url_id}'
             
-            # Check for available artifacts
-            artifact_files = ['archive.wacz', 'metadata.json', 'screenshot.png', 'singlefile.html']
-            available_artifacts = []
-            
-            for artifact in artifact_files:
-                if (snapshot_dir / artifact).exists():
-                    available_artifacts.append(artifact)
-            
-            return Snapshot(
+            snapshot = Snapshot(
                 snapshot_id=snapshot_id,
                 timestamp=timestamp,
                 url=url,
                 title=metadata.get('title', ''),
-                folder_path=str(snapshot_dir),  # Convert Path to string for Pydantic
+                folder_path=snapshot_dir,  # Already a string for Pydantic
                 metadata=metadata,
                 available_artifacts=available_artifacts
             )
             
+            # Record stats for ETag / Last-Modified, reusing the ones taken above
+            # (DirEntry caches its stat). Size and inode come from metadata.json,
+            # so rewriting it in place changes the ETag; the mtime is the later
+            # of the file's and the directory's, which moves when artifacts are
+            # added or removed. Without metadata.json only the directory stat is
+            # available, and its st_size says nothing about the contents.
+            dir_stat = dir_entry.stat() if dir_entry is not None else None
+            if metadata_stat is not None:
+                mtime_ns = metadata_stat.st_mtime_ns
+                if dir_stat is not None:
+                    mtime_ns = max(mtime_ns, dir_stat.st_mtime_ns)
+                snapshot._stat_cache = (mtime_ns, metadata_stat.st_size, metadata_stat.st_ino)
+            elif dir_stat is not None:
+                snapshot._stat_cache = (dir_stat.st_mtime_ns, 0, dir_stat.st_ino)
+            
+            return snapshot
+            
         except Exception as e:
             logger.error(f"Error scanning snapshot directory {snapshot_dir}: {e}")
             return None
 
-    def _scan_path_directory(self, path_dir: Path, domain: str) -> list[Snapshot]:
+    def _iter_request_dirs(self, domain_dir: os.DirEntry) -> Iterator[Tuple[os.DirEntry, os.DirEntry]]:
         """
-        Scan a path directory for request-timestamp snapshot folders.
+        Walk the path and request levels under a domain in a single pass.
         
         Args:
-            path_dir: Path to path segment directory (e.g., archives/example_com/home_page)
-            domain: Domain name for URL construction
+            domain_dir: Directory entry for the domain (e.g., archives/example_com)
             
-        Returns:
-            List of Snapshot objects found in this path directory
+        Yields:
+            (path_dir, request_dir) directory entry pairs, grouped by path_dir
         """
-        snapshots = []
-        path_segment = path_dir.name
-        url_id = f"{domain}_{path_segment}"
+        with os.scandir(domain_dir.path) as it:
+            path_dirs = [entry for entry in it if entry.is_dir()]
         
-        try:
-            # Scan for request-timestamp snapshot subdirectories
-            for item in path_dir.iterdir():
-                if self._check_timeout():
-                    logger.warning(f"Timeout reached while scanning {path_dir}")
-                    break
-                
-                if not item.is_dir():
-                    continue
-                
-                # Only process directories that start with 'req_'
-                if not item.name.startswith('req_'):
-                    logger.debug(f"Skipping non-request directory: {item.name}")
-                    continue
-                
-                snapshot = self._scan_snapshot_directory(item, url_id)
-                if snapshot:
-                    snapshots.append(snapshot)
-        
-        except Exception as e:
-            logger.error(f"Error scanning path directory {path_dir}: {e}")
+        # Hoisted out of the per-entry loop below
+        match_timestamp = _TIMESTAMP_RE.fullmatch
+        fallback_to_mtime = self.fallback_to_mtime
         
-        return snapshots
+        for path_dir in path_dirs:
+            if self._check_timeout():
+                logger.warning(f"Timeout reached while scanning domain {domain_dir.path}")
+                return
+            
+            try:
+                with os.scandir(path_dir.path) as it:
+                    for item in it:
+                        name = item.name
+                        
+                        # Check the name before is_dir() so invalid folders cost no stat:
+                        # a req_ prefix plus a timestamp layout _TIMESTAMP_RE accepts.
+                        # With the mtime fallback any req_ folder is worth a closer look.
+                        if name[:4] != _REQUEST_PREFIX or (
+                                match_timestamp(name) is None and not fallback_to_mtime):
+                            logger.debug(f"Skipping non-request directory: {name}")
+                            continue
+                        
+                        # DirEntry.is_dir() uses the d_type from readdir, so no extra stat
+                        if item.is_dir():
+                            yield path_dir, item
+            
+            except OSError as e:
+                logger.error(f"Error scanning path directory {path_dir.path}: {e}")
 
-    def _scan_domain_directory(self, domain_dir: Path) -> list[ArchivedUrl]:
+    def _scan_domain_directory(self, domain_dir: os.DirEntry) -> list[ArchivedUrl]:
         """
         Scan a domain directory for path subdirectories.
         
         Args:
-            domain_dir: Path to domain directory (e.g., archives/example_com)
+            domain_dir: Directory entry for the domain (e.g., archives/example_com)
             
         Returns:
             List of ArchivedUrl objects found in this domain
@@ -235,27 +479,30 @@ class FilesystemStorageProvider(StorageProvider):
         domain = domain_dir.name
         
         try:
-            # Scan for path subdirectories
-            for path_dir in domain_dir.iterdir():
-                if self._check_timeout():
-                    logger.warning(f"Timeout reached while scanning domain {domain_dir}")
-                    break
+            # One flat loop over (path, request) pairs; groupby splits it back
+            # into path directories without a nested per-path scan method
+            for path_dir, items in groupby(self._iter_request_dirs(domain_dir), key=itemgetter(0)):
+                path_name = path_dir.name
                 
-                if not path_dir.is_dir():
-                    continue
+                # Build the URL ID and folder name once per path directory;
+                # every snapshot in it shares the same (interned) url_id
+                url_id = sys.intern(f"{domain}_{path_name}")
                 
                 # Get snapshots for this path
-                snapshots = self._scan_path_directory(path_dir, domain)
+                snapshots = [
+                    snapshot for snapshot in (
+                        self._scan_snapshot_directory(item.path, url_id, item)
+                        for _, item in items
+                    )
+                    if snapshot
+                ]
                 
                 if not snapshots:
-                    logger.debug(f"No valid snapshots found in {path_dir}")
+                    logger.debug(f"No valid snapshots found in {path_dir.path}")
                     continue
                 
                 # Sort snapshots by timestamp (newest first)
-                snapshots.sort(key=lambda s: s.timestamp, reverse=True)
-                
-                # Create URL ID from domain and path
-                url_id = f"{domain}_{path_dir.name}"
+                snapshots.sort(key=attrgetter('timestamp'), reverse=True)
                 
                 # Get original URL from first snapshot
                 original_url = snapshots[0].url if snapshots else f"https://{domain.replace('_', '.')}"
@@ -263,66 +510,180 @@ class FilesystemStorageProvider(StorageProvider):
                 archived_url = ArchivedUrl(
                     url_id=url_id,
                     original_url=original_url,
-                    folder_name=f"{domain}/{path_dir.name}",
+                    folder_name=f"{domain}/{path_name}",
                     snapshots=snapshots
                 )
                 
                 archived_urls.append(archived_url)
         
         except Exception as e:
-            logger.error(f"Error scanning domain directory {domain_dir}: {e}")
+            logger.error(f"Error scanning domain directory {domain_dir.path}: {e}")
         
         return archived_urls
 
-    def _scan_storage(self) -> Dict[str, ArchivedUrl]:
+    def iter_urls(self) -> Iterator[Tuple[str, ArchivedUrl]]:
+        """
+        Lazily scan the storage directory using the three-level hierarchy.
+        
+        Archived URLs are yielded domain by domain in name order, each as soon
+        as its domain directory (and every one before it) has been scanned, so
+        callers can start consuming results before the scan finishes and
+        repeated scans of an unchanged tree yield the same order.
+        
+        Once the iterator is exhausted the scanned URLs become the provider's
+        current results, exactly as after get_all_urls(): lookups by ID and
+        artifact see them and stale scan cache entries are pruned. A caller
+        that stops early leaves the previous results in place.
+        
+        Yields:
+            (url_id, ArchivedUrl) tuples
+        """
+        archived_urls: Dict[str, ArchivedUrl] = {}
+        for url_id, archived_url in self._iter_scan():
+            archived_urls[url_id] = archived_url
+            yield url_id, archived_url
+        
+        self._finish_scan(archived_urls)
+
+    def _iter_scan(self) -> Iterator[Tuple[str, ArchivedUrl]]:
         """
-        Scan the storage directory for all archived URLs and snapshots using three-level hierarchy.
+        Scan the storage directory, yielding URLs as domains complete.
         
         Structure: archives/domain/path_segment/req_request-id_timestamp/
         
-        Returns:
-            Dictionary mapping url_id to ArchivedUrl objects
+        Yields:
+            (url_id, ArchivedUrl) tuples
         """
-        self._start_time = time.time()
-        archived_urls = {}
+        self._start_deadline()
         
         try:
-            if not self.storage_path.exists():
-                logger.error(f"Storage path does not exist: {self.storage_path}")
-                return archived_urls
-            
-            if not self.storage_path.is_dir():
-                logger.error(f"Storage path is not a directory: {self.storage_path}")
-                return archived_urls
-            
             logger.info(f"Scanning archives directory: {self.storage_path}")
             
-            # Scan each domain directory (level 1)
-            for domain_dir in self.storage_path.iterdir():
-                if self._check_timeout():
-                    logger.warning("Scan timeout reached")
-                    break
-                
-                if not domain_dir.is_dir():
-                    continue
-                
-                # Get all archived URLs for this domain
-                domain_urls = self._scan_domain_directory(domain_dir)
-                
-                # Add each archived URL to results
-                for archived_url in domain_urls:
-                    archived_urls[archived_url.url_id] = archived_url
-            
-            scan_duration = time.time() - self._start_time
-            total_snapshots = sum(url.snapshot_count for url in archived_urls.values())
-            logger.info(f"Scan completed in {scan_duration:.2f}s. Found {len(archived_urls)} URLs with {total_snapshots} total snapshots")
-            
-            return archived_urls
+            # List the root directly instead of stat-ing it first; a missing or
+            # non-directory path surfaces as an error from scandir itself.
+            # DirEntry.is_dir() reuses the d_type from readdir instead of a stat per entry
+            try:
+                with os.scandir(self.storage_path) as it:
+                    domain_dirs = sorted((entry for entry in it if entry.is_dir()), key=attrgetter('name'))
+            except (FileNotFoundError, NotADirectoryError):
+                logger.error(f"Storage path does not exist or is not a directory: {self.storage_path}")
+                return
+            
+            # Scan domain directories (level 1) concurrently; the work is dominated
+            # by stat/open/read syscalls, which release the GIL
+            executor = ThreadPoolExecutor(max_workers=self.workers)
+            try:
+                futures = [executor.submit(self._scan_domain_directory, d) for d in domain_dirs]
+                # Collect results in submission (domain name) order rather than
+                # completion order so every scan yields URLs in the same order
+                for future in futures:
+                    for archived_url in future.result(timeout=self._remaining_time()):
+                        yield archived_url.url_id, archived_url
+            except FuturesTimeoutError:
+                logger.warning("Scan timeout reached")
+            finally:
+                # On timeout (or when the caller stops iterating early) drop the
+                # domains still queued instead of blocking until they are scanned;
+                # running tasks stop at their next timeout check
+                executor.shutdown(wait=False, cancel_futures=True)
             
         except Exception as e:
             logger.error(f"Error during storage scan: {e}")
-            return archived_urls
+
+    def _scan_storage(self) -> Dict[str, ArchivedUrl]:
+        """
+        Scan the storage directory for all archived URLs and snapshots.
+        
+        Returns:
+            Dictionary mapping url_id to ArchivedUrl objects
+        """
+        return dict(self.iter_urls())
+
+    def _finish_scan(self, archived_urls: Dict[str, ArchivedUrl]) -> None:
+        """
+        Make the results of a fully consumed scan the provider's current results.
+        
+        Args:
+            archived_urls: Every URL yielded by the scan, keyed by url_id
+        """
+        # A scan that ran to completion saw every snapshot, so cache entries for
+        # anything else belong to deleted or renamed directories
+        self._scan_complete = not self._check_timeout()
+        if self._scan_complete:
+            self._prune_caches({
+                snapshot.folder_path
+                for archived_url in archived_urls.values()
+                for snapshot in archived_url.snapshots
+            })
+        
+        # Index snapshots once per scan so ID lookups are a single dict access
+        snapshot_index: Dict[str, Snapshot] = {}
+        by_artifact: Dict[str, set] = {}
+        for archived_url in archived_urls.values():
+            for snapshot in archived_url.snapshots:
+                snapshot_index.setdefault(snapshot.snapshot_id, snapshot)
+                for artifact_name in snapshot.available_artifacts:
+                    by_artifact.setdefault(artifact_name, set()).add(snapshot.snapshot_id)
+        
+        self._snapshot_index = snapshot_index
+        self._by_artifact = by_artifact
+        self._cached_results = archived_urls
+        
+        scan_duration = (time.monotonic_ns() - self._start_time_ns) / 1_000_000_000
+        total_snapshots = sum(url.snapshot_count for url in archived_urls.values())
+        logger.info(f"Scan completed in {scan_duration:.2f}s. Found {len(archived_urls)} URLs with {total_snapshots} total snapshots")
+        
+    def get_change_token(self) -> Optional[frozenset]:
+        """
+        Get the modification times of every directory and metadata.json in the archive tree.
         
+        Creating or removing a snapshot bumps its path directory's mtime,
+        adding or removing artifacts bumps the snapshot directory's mtime, and
+        rewriting a metadata.json in place bumps its own mtime, so the token
+        changes for all three. It costs one readdir per directory and two stats
+        per snapshot, but reads no files. The walk is bound by the same timeout
+        as a scan.
+        
+        Returns:
+            Frozenset of (path, st_mtime_ns) pairs, or None if the tree can't be
+            read in time
+        """
+        self._start_deadline()
+        try:
+            entries = [(os.fspath(self.storage_path), os.stat(self.storage_path).st_mtime_ns)]
+            with os.scandir(self.storage_path) as domains:
+                domain_dirs = [entry for entry in domains if entry.is_dir()]
+            for domain_dir in domain_dirs:
+                entries.append((domain_dir.path, domain_dir.stat().st_mtime_ns))
+                with os.scandir(domain_dir.path) as paths:
+                    path_dirs = [entry for entry in paths if entry.is_dir()]
+                for path_dir in path_dirs:
+                    if self._check_timeout():
+                        logger.debug(f"Timeout reached while computing change token for {self.storage_path}")
+                        return None
+                    entries.append((path_dir.path, path_dir.stat().st_mtime_ns))
+                    with os.scandir(path_dir.path) as requests:
+                        request_dirs = [
+                            entry for entry in requests
+                            if entry.name[:4] == _REQUEST_PREFIX and entry.is_dir()
+                        ]
+                    for request_dir in request_dirs:
+                        entries.append((request_dir.path, request_dir.stat().st_mtime_ns))
+                        metadata_path = os.path.join(request_dir.path, 'metadata.json')
+                        try:
+                            entries.append((metadata_path, os.stat(metadata_path).st_mtime_ns))
+                        except FileNotFoundError:
+                            pass
+            return frozenset(entries)
+            
+        except OSError as e:
+            logger.debug(f"Could not compute change token for {self.storage_path}: {e}")
+            return None
+
+    def is_scan_complete(self) -> bool:
+        """Check whether the last consumed scan finished before the timeout."""
+        return self._scan_complete
+
     def get_all_urls(self) -> Dict[str, ArchivedUrl]:
         """
         Get all archived URLs from filesystem.
@@ -334,10 +695,9 @@ class FilesystemStorageProvider(StorageProvider):
             StorageError: If filesystem scan fails
         """
         try:
-            # Perform direct filesystem scan
-            archived_urls = self._scan_storage()
-            self._cached_results = archived_urls
-            return archived_urls
+            # Perform direct filesystem scan; consuming it fully also rebuilds
+            # the snapshot and artifact indexes
+            return self._scan_storage()
             
         except Exception as e:
             logger.error(f"Error scanning filesystem storage: {e}")
@@ -381,25 +741,55 @@ class FilesystemStorageProvider(StorageProvider):
             StorageError: If storage operation fails
         """
         try:
-            # Get all URLs to search for snapshot
+            # Scan (and build the snapshot index) if not cached
             if self._cached_results is None:
                 self.get_all_urls()
             
-            if not self._cached_results:
-                return None
-                
-            # Search through all URLs for the snapshot
-            for archived_url in self._cached_results.values():
-                for snapshot in archived_url.snapshots:
-                    if snapshot.snapshot_id == snapshot_id:
-                        return snapshot
-            
-            return None
+            return self._snapshot_index.get(snapshot_id)
             
         except Exception as e:
             logger.error(f"Error getting snapshot {snapshot_id}: {e}")
             raise StorageError(f"Failed to get snapshot {snapshot_id}: {str(e)}") from e
 
+    def get_snapshots_with_artifact(self, artifact_type: str) -> List[Snapshot]:
+        """
+        Get all snapshots that have a specific artifact.
+        
+        Args:
+            artifact_type: Type of artifact (e.g., 'archive.wacz', 'screenshot.png')
+            
+        Returns:
+            List of Snapshot objects with that artifact (unordered)
+            
+        Raises:
+            StorageError: If storage operation fails
+        """
+        try:
+            # Scan (and build the artifact index) if not cached
+            if self._cached_results is None:
+                self.get_all_urls()
+            
+            snapshot_ids = self._by_artifact.get(artifact_type, ())
+            return [self._snapshot_index[snapshot_id] for snapshot_id in snapshot_ids]
+            
+        except Exception as e:
+            logger.error(f"Error getting snapshots with artifact {artifact_type}: {e}")
+            raise StorageError(f"Failed to get snapshots with artifact {artifact_type}: {str(e)}") from e
+
+    @staticmethod
+    def _has_artifact(snapshot: Snapshot, artifact_type: str) -> bool:
+        """
+        Check whether a snapshot had an artifact file when it was scanned.
+        
+        Known artifact types are answered from the listing taken during the
+        scan without touching the disk; other names fall back to a stat. The
+        listing may be stale, so this is only used to skip an open() that
+        would fail; callers that open the file still handle it being gone.
+        """
+        if artifact_type in _KNOWN_ARTIFACTS:
+            return artifact_type in snapshot.available_artifacts
+        return os.path.isfile(os.path.join(snapshot.folder_path, artifact_type))
+
     def get_artifact_stream(self, snapshot_id: str, artifact_type: str) -> Optional[IO]:
         """
         Get a stream to a specific artifact file.
@@ -423,17 +813,98 @@ class FilesystemStorageProvider(StorageProvider):
             # Build artifact file path (convert string back to Path)
             artifact_path = Path(snapshot.folder_path) / artifact_type
             
-            if not artifact_path.exists():
+            if not self._has_artifact(snapshot, artifact_type):
+                logger.debug(f"Artifact not found: {artifact_path}")
+                return None
+            
+            # Open and return file stream; the file may have been removed since
+            # the scan, so a missing file is reported the same way
+            try:
+                fd = os.open(artifact_path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+            except FileNotFoundError:
                 logger.debug(f"Artifact not found: {artifact_path}")
                 return None
             
-            # Open and return file stream
-            return open(artifact_path, 'rb')
+            try:
+                # Artifacts are streamed sequentially; ask for aggressive readahead
+                if hasattr(os, 'posix_fadvise'):
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                return os.fdopen(fd, 'rb', buffering=_ARTIFACT_BUFFER_SIZE)
+            except Exception:
+                os.close(fd)
+                raise
             
         except Exception as e:
             logger.error(f"Error getting artifact stream {snapshot_id}/{artifact_type}: {e}")
             raise StorageError(f"Failed to get artifact stream: {str(e)}") from e
 
+    def sendfile_artifact(self, snapshot_id: str, artifact_type: str, out_fd: int) -> Optional[int]:
+        """
+        Copy an artifact to an open file descriptor, such as a client socket.
+        
+        Uses os.sendfile so the data is copied inside the kernel without passing
+        through Python buffers. Where sendfile is unavailable or doesn't support
+        the target descriptor, it falls back to a read/write loop. out_fd must
+        be in blocking mode.
+        
+        Args:
+            snapshot_id: The snapshot identifier
+            artifact_type: Type of artifact (e.g., 'archive.wacz', 'screenshot.png')
+            out_fd: Writable file descriptor to send the artifact to
+            
+        Returns:
+            Number of bytes written, or None if the artifact was not found
+            
+        Raises:
+            StorageError: If storage operation fails
+        """
+        try:
+            snapshot = self.get_snapshot_by_id(snapshot_id)
+            if not snapshot or not self._has_artifact(snapshot, artifact_type):
+                return None
+            
+            artifact_path = os.path.join(snapshot.folder_path, artifact_type)
+            try:
+                in_fd = os.open(artifact_path, os.O_RDONLY | getattr(os, 'O_CLOEXEC', 0))
+            except FileNotFoundError:
+                logger.debug(f"Artifact not found: {artifact_path}")
+                return None
+            
+            try:
+                count = os.fstat(in_fd).st_size
+                offset = 0
+                
+                if hasattr(os, 'sendfile'):
+                    try:
+                        while offset < count:
+                            sent = os.sendfile(out_fd, in_fd, offset, count - offset)
+                            if sent == 0:
+                                break
+                            offset += sent
+                        return offset
+                    except OSError as e:
+                        # Only fall back if sendfile rejected the descriptors outright
+                        if offset or e.errno not in _SENDFILE_FALLBACK_ERRNOS:
+                            raise
+                
+                # Copy through a user-space buffer
+                while True:
+                    chunk = os.read(in_fd, _ARTIFACT_BUFFER_SIZE)
+                    if not chunk:
+                        break
+                    view = memoryview(chunk)
+                    while view:
+                        view = view[os.write(out_fd, view):]
+                    offset += len(chunk)
+                return offset
+            
+            finally:
+                os.close(in_fd)
+            
+        except Exception as e:
+            logger.error(f"Error sending artifact {snapshot_id}/{artifact_type}: {e}")
+            raise StorageError(f"Failed to send artifact: {str(e)}") from e
+
     def artifact_exists(self, snapshot_id: str, artifact_type: str) -> bool:
         """
         Check if a specific artifact exists.
@@ -454,9 +925,8 @@ class FilesystemStorageProvider(StorageProvider):
             if not snapshot:
                 return False
             
-            # Check if artifact file exists
-            artifact_path = Path(snapshot.folder_path) / artifact_type
-            return artifact_path.exists() and artifact_path.is_file()
+            # Check the disk rather than the scan listing, which may be stale
+            return os.path.isfile(os.path.join(snapshot.folder_path, artifact_type))
             
         except Exception as e:
             logger.error(f"Error checking artifact existence {snapshot_id}/{artifact_type}: {e}")
@@ -482,13 +952,13 @@ class FilesystemStorageProvider(StorageProvider):
             if not snapshot:
                 return None
             
-            # Build and validate artifact file path
-            artifact_path = Path(snapshot.folder_path) / artifact_type
-            
-            if not artifact_path.exists():
+            # Build and validate artifact file path; callers open it right
+            # away, so check the disk rather than the (possibly stale) scan listing
+            artifact_path = os.path.join(snapshot.folder_path, artifact_type)
+            if not os.path.isfile(artifact_path):
                 return None
                 
-            return artifact_path
+            return Path(artifact_path)
             
         except Exception as e:
             logger.error(f"Error getting artifact path {snapshot_id}/{artifact_type}: {e}")
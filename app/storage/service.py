@@ -5,9 +5,11 @@ This module provides the StorageService class that acts as the main interface
 between APIs and storage providers, with centralized caching and business logic.
 """
 
+import heapq
 import logging
 import time
-from typing import Dict, Optional, IO
+from datetime import datetime
+from typing import Any, Dict, List, Optional, IO, Tuple
 from pathlib import Path
 
 from ..models.url import ArchivedUrl
@@ -16,6 +18,15 @@ from .providers.base import StorageProvider, StorageError
 
 logger = logging.getLogger(__name__)
 
+# Sort options for paginated URL listings: name -> (key function, reverse).
+# Every key ends with the unique url_id so ties always break the same way and
+# consecutive pages never repeat or skip a URL.
+_SORT_KEYS = {
+    'url': (lambda u: (str(u.original_url).lower(), u.url_id), False),
+    'last_captured': (lambda u: (u.last_captured or datetime.min, u.url_id), True),
+    'snapshot_count': (lambda u: (u.snapshot_count, u.url_id), True),
+}
+
 
 class StorageService:
     """
@@ -38,6 +49,10 @@ class StorageService:
         self.cache_ttl_seconds = cache_ttl_seconds
         self._cached_urls: Optional[Dict[str, ArchivedUrl]] = None
         self._cache_timestamp = 0.0
+        self._change_token: Optional[Any] = None
+        # Sort option -> URLs in that order, for the URL dict they were built from
+        self._sorted_urls: Dict[str, Tuple[ArchivedUrl, ...]] = {}
+        self._sorted_source: Optional[Dict[str, ArchivedUrl]] = None
         
     def _is_cache_expired(self) -> bool:
         """Check if cache has expired based on TTL."""
@@ -48,9 +63,27 @@ class StorageService:
     def _refresh_cache(self) -> Dict[str, ArchivedUrl]:
         """Refresh the URL cache from provider."""
         try:
+            # When caching is enabled and the provider reports that nothing has
+            # changed since the last scan, extend the cached result instead of
+            # rescanning. The token is taken before the scan so changes made
+            # while scanning trigger another refresh next time. With caching
+            # disabled every call rescans anyway, so the token (a walk of the
+            # whole tree) is not computed at all.
+            change_token = None
+            if self.cache_ttl_seconds > 0:
+                change_token = self.provider.get_change_token()
+            if (change_token is not None and self._cached_urls is not None
+                    and change_token == self._change_token):
+                logger.debug("Storage unchanged since last scan, keeping cached URLs")
+                self._cache_timestamp = time.time()
+                return self._cached_urls
+            
             logger.debug("Refreshing storage cache from provider")
             self._cached_urls = self.provider.get_all_urls()
             self._cache_timestamp = time.time()
+            # A partial (timed out) result must not be kept alive by the token,
+            # or it would be served until something on disk changes
+            self._change_token = change_token if self.provider.is_scan_complete() else None
             
             if self.cache_ttl_seconds > 0:
                 logger.debug(f"Storage cache refreshed (TTL: {self.cache_ttl_seconds}s, URLs: {len(self._cached_urls)})")
@@ -67,6 +100,9 @@ class StorageService:
         """Clear the cache manually and reset timestamp."""
         self._cached_urls = None
         self._cache_timestamp = 0.0
+        self._change_token = None
+        self._sorted_urls = {}
+        self._sorted_source = None
         logger.debug("Storage cache manually cleared")
     
     def get_cache_stats(self) -> dict:
@@ -104,6 +140,68 @@ class StorageService:
             logger.error(f"Error getting all URLs: {e}")
             raise StorageError(f"Failed to get all URLs: {str(e)}") from e
     
+    def get_page(self, page: int, limit: int, sort: str = 'url') -> Tuple[List[ArchivedUrl], int]:
+        """
+        Get one page of archived URLs in the requested order.
+        
+        Only the requested slice is returned, so callers serialize at most
+        `limit` URLs regardless of how many are stored. With caching disabled
+        the URLs are streamed from the provider and only the first
+        page * limit in sort order are selected, instead of sorting the full
+        mapping on every request; the streamed scan still refreshes the
+        provider's indexes and the cache stats.
+        
+        Args:
+            page: Page number (1-based)
+            limit: Number of URLs per page
+            sort: Sort option ('url', 'last_captured' or 'snapshot_count')
+            
+        Returns:
+            Tuple of (URLs on the requested page, total number of URLs)
+            
+        Raises:
+            StorageError: If storage operation fails or sort is unknown
+        """
+        try:
+            key, reverse = _SORT_KEYS[sort]
+            start_idx = (page - 1) * limit
+            
+            if self.cache_ttl_seconds <= 0:
+                scanned_urls: Dict[str, ArchivedUrl] = {}
+                
+                def collected_urls():
+                    for url_id, archived_url in self.provider.iter_urls():
+                        scanned_urls[url_id] = archived_url
+                        yield archived_url
+                
+                # Same order as sorted(..., reverse=reverse)[:n], ties included
+                select = heapq.nlargest if reverse else heapq.nsmallest
+                top_urls = select(start_idx + limit, collected_urls(), key=key)
+                
+                # Keep the streamed scan as the latest result, as _refresh_cache
+                # does with caching disabled, so cache stats stay accurate
+                self._cached_urls = scanned_urls
+                self._cache_timestamp = time.time()
+                return top_urls[start_idx:], len(scanned_urls)
+            
+            url_dict = self.get_all_urls()
+            
+            # Sort once per scan result and sort option; later pages and requests
+            # until the next refresh are just slices of the stored order
+            if self._sorted_source is not url_dict:
+                self._sorted_urls = {}
+                self._sorted_source = url_dict
+            archived_urls = self._sorted_urls.get(sort)
+            if archived_urls is None:
+                archived_urls = tuple(sorted(url_dict.values(), key=key, reverse=reverse))
+                self._sorted_urls[sort] = archived_urls
+            
+            return list(archived_urls[start_idx:start_idx + limit]), len(archived_urls)
+            
+        except Exception as e:
+            logger.error(f"Error getting URL page {page} (limit {limit}, sort {sort}): {e}")
+            raise StorageError(f"Failed to get URL page: {str(e)}") from e
+    
     def get_url_by_id(self, url_id: str) -> Optional[ArchivedUrl]:
         """
         Get a specific archived URL by its ID.
@@ -0,0 +1,42 @@
+"""
+Shared helpers for the test suite.
+"""
+
+import os
+
+from orjson import dumps as dump_json
+
+
+def write_tree(root, files):
+    """
+    Write (relative path, payload) pairs under root, creating directories as needed.
+    
+    Bytes payloads are written as-is; anything else is serialized as JSON.
+    """
+    root = os.fspath(root)
+    files = list(files)
+    
+    # Create each directory once, parents before children, rather than having
+    # makedirs re-walk the shared prefix for every file
+    dirs = set()
+    for rel_path, _ in files:
+        rel_dir = os.path.dirname(rel_path)
+        while rel_dir and rel_dir not in dirs:
+            dirs.add(rel_dir)
+            rel_dir = os.path.dirname(rel_dir)
+    os.makedirs(root, exist_ok=True)
+    for rel_dir in sorted(dirs, key=lambda d: d.count("/")):
+        try:
+            os.mkdir(os.path.join(root, rel_dir))
+        except FileExistsError:
+            pass
+    
+    for rel_path, payload in files:
+        full_path = os.path.join(root, rel_path)
+        if not isinstance(payload, bytes):
+            payload = dump_json(payload)
+        fd = os.open(full_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, payload)
+        finally:
+            os.close(fd)
@@ -4,7 +4,7 @@ Unit tests for Pydantic models.
 
 import json
 import pytest
-from datetime import datetime
+from datetime import datetime, timezone
 from pydantic import ValidationError
 
 from app.models.url import ArchivedUrl
@@ -126,6 +126,20 @@ class TestSnapshot:
         assert snapshot.status_code == 200
         assert snapshot.content_type == "text/html"
         assert snapshot.content_length == 1024
+    
+    def test_stat_cache_helpers(self):
+        """Test ETag and Last-Modified helpers backed by the scan-time stat."""
+        snapshot = Snapshot(
+            snapshot_id="20240315T143022Z",
+            timestamp="2024-03-15T14:30:22Z",
+            url="https://example.com"
+        )
+        assert snapshot.etag() is None
+        assert snapshot.last_modified() is None
+        
+        snapshot._stat_cache = (1_710_513_022_000_000_000, 4096, 42)
+        assert snapshot.etag() == 'W/"2a-1000-17bcf687e3fd6c00"'
+        assert snapshot.last_modified() == datetime(2024, 3, 15, 14, 30, 22, tzinfo=timezone.utc)
 
 
 class TestArtifact:
@@ -343,6 +357,36 @@ class TestArchivedUrl:
         assert archived_url.first_captured == datetime(2024, 3, 15, 14, 30, 22)
         assert archived_url.last_captured == datetime(2024, 3, 16, 12, 0, 0)
         assert archived_url.date_range == "2024-03-15 to 2024-03-16"
+    
+    def test_get_snapshot_by_id(self):
+        """Test snapshot lookup by ID, including after the list is replaced."""
+        snapshots = [
+            Snapshot(
+                snapshot_id="20240315T143022Z",
+                timestamp="2024-03-15T14:30:22Z",
+                url="https://example.com"
+            ),
+            Snapshot(
+                snapshot_id="20240316T120000Z",
+                timestamp="2024-03-16T12:00:00Z",
+                url="https://example.com"
+            )
+        ]
+        
+        archived_url = ArchivedUrl(
+            url_id="example_com",
+            original_url="https://example.com",
+            folder_name="example_com",
+            snapshots=snapshots
+        )
+        
+        assert archived_url.get_snapshot_by_id("20240315T143022Z").timestamp == datetime(2024, 3, 15, 14, 30, 22)
+        assert archived_url.get_snapshot_by_id("nonexistent") is None
+        
+        # Replacing the list rebuilds the index
+        archived_url.snapshots = snapshots[:1]
+        assert archived_url.get_snapshot_by_id("20240316T120000Z") is None
+        assert archived_url.get_snapshot_by_id("20240315T143022Z") is not None
 
 
 class TestResponseModels:
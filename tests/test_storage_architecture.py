@@ -2,61 +2,78 @@
 Unit tests for the new storage architecture with providers and service.
 """
 
-import json
-import tempfile
+import os
 import pytest
 import shutil
 from datetime import datetime
-from pathlib import Path
+from unittest.mock import patch
 from app.storage.providers.filesystem import FilesystemStorageProvider
 from app.storage.service import StorageService
+from app.storage.providers.base import StorageError
 from app.storage.factory import create_storage_provider, create_storage_service
 from app.models.snapshot import Snapshot
 from app.models.url import ArchivedUrl
+from tests.helpers import dump_json, write_tree
+
+
+# Fixture metadata, built once at import time
+_EXAMPLE_METADATA = {
+    "archive_info": {
+        "url": "https://example.com",
+        "request_id": "test-1"
+    },
+    "title": "Example Domain"
+}
+_SERVICE_METADATA = {
+    domain: {
+        "archive_info": {
+            "url": f"https://{domain.replace('_', '.')}",
+            "request_id": domain
+        }
+    }
+    for domain in ["example_com", "test_org"]
+}
+
+
+@pytest.fixture(scope="module")
+def temp_archives(tmp_path_factory):
+    """Create temporary archives directory with test data (read-only, shared by the module)."""
+    archives_path = tmp_path_factory.mktemp("archives")
+    
+    # Create test structure: archives/domain/path/req_id_timestamp/
+    request_dir = "example_com/home_page/req_test-1_20250904_120000"
+    write_tree(archives_path, [
+        (f"{request_dir}/metadata.json", _EXAMPLE_METADATA),
+        (f"{request_dir}/archive.wacz", b"fake wacz data"),
+        (f"{request_dir}/screenshot.png", b"fake image data"),
+    ])
+    
+    return archives_path
+
+
+@pytest.fixture(scope="module")
+def service_archives(tmp_path_factory):
+    """Create temporary archives directory with several URLs (read-only, shared by the module)."""
+    archives_path = tmp_path_factory.mktemp("service_archives")
+    
+    # Create multiple domains and URLs for testing
+    write_tree(archives_path, [
+        (f"{domain}/home_page/req_{domain}_20250904_120000/metadata.json", metadata)
+        for domain, metadata in _SERVICE_METADATA.items()
+    ])
+    
+    return archives_path
 
 
 class TestFilesystemStorageProvider:
     """Test cases for FilesystemStorageProvider."""
     
-    @pytest.fixture
-    def temp_archives(self):
-        """Create temporary archives directory with test data."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            archives_path = Path(temp_dir) / "archives"
-            archives_path.mkdir()
-            
-            # Create test structure: archives/domain/path/req_id_timestamp/
-            domain_dir = archives_path / "example_com"
-            domain_dir.mkdir()
-            
-            path_dir = domain_dir / "home_page"
-            path_dir.mkdir()
-            
-            request_dir = path_dir / "req_test-1_20250904_120000"
-            request_dir.mkdir()
-            
-            # Create metadata.json
-            metadata = {
-                "archive_info": {
-                    "url": "https://example.com",
-                    "request_id": "test-1"
-                },
-                "title": "Example Domain"
-            }
-            with open(request_dir / "metadata.json", "w") as f:
-                json.dump(metadata, f)
-            
-            # Create artifacts
-            (request_dir / "archive.wacz").write_bytes(b"fake wacz data")
-            (request_dir / "screenshot.png").write_bytes(b"fake image data")
-            
-            yield archives_path
-
     def test_provider_initialization(self, temp_archives):
         """Test provider initialization."""
         provider = FilesystemStorageProvider(temp_archives)
         assert provider.storage_path == temp_archives
         assert provider.timeout_seconds == 10
+        assert provider.workers >= 1
 
     def test_get_all_urls(self, temp_archives):
         """Test getting all URLs from storage."""
@@ -72,6 +89,14 @@ class TestFilesystemStorageProvider:
         assert str(archived_url.original_url) == "https://example.com/"
         assert len(archived_url.snapshots) == 1
 
+    def test_iter_urls(self, temp_archives):
+        """Test lazily iterating archived URLs."""
+        provider = FilesystemStorageProvider(temp_archives)
+        items = list(provider.iter_urls())
+
+        assert [url_id for url_id, _ in items] == ["example_com_home_page"]
+        assert isinstance(items[0][1], ArchivedUrl)
+
     def test_get_url_by_id(self, temp_archives):
         """Test getting specific URL by ID."""
         provider = FilesystemStorageProvider(temp_archives)
@@ -109,6 +134,9 @@ class TestFilesystemStorageProvider:
         assert provider.artifact_exists(snapshot_id, "archive.wacz")
         assert provider.artifact_exists(snapshot_id, "screenshot.png")
         assert not provider.artifact_exists(snapshot_id, "nonexistent.file")
+        assert not provider.artifact_exists(snapshot_id, "singlefile.html")
+        assert provider.get_artifact_path(snapshot_id, "singlefile.html") is None
+        assert provider.get_artifact_stream(snapshot_id, "singlefile.html") is None
         
         # Test get artifact path
         wacz_path = provider.get_artifact_path(snapshot_id, "archive.wacz")
@@ -122,6 +150,45 @@ class TestFilesystemStorageProvider:
             data = stream.read()
             assert data == b"fake wacz data"
 
+    def test_snapshots_with_artifact(self, temp_archives):
+        """Test looking up snapshots through the reverse artifact index."""
+        provider = FilesystemStorageProvider(temp_archives)
+        
+        with_wacz = provider.get_snapshots_with_artifact("archive.wacz")
+        assert [s.snapshot_id for s in with_wacz] == ["req_test-1_20250904_120000"]
+        assert provider.get_snapshots_with_artifact("singlefile.html") == []
+
+    def test_sendfile_artifact(self, temp_archives):
+        """Test sending an artifact to a file descriptor."""
+        provider = FilesystemStorageProvider(temp_archives)
+        snapshot_id = "req_test-1_20250904_120000"
+        
+        read_fd, write_fd = os.pipe()
+        try:
+            assert provider.sendfile_artifact(snapshot_id, "archive.wacz", write_fd) == len(b"fake wacz data")
+            assert os.read(read_fd, 1024) == b"fake wacz data"
+            assert provider.sendfile_artifact(snapshot_id, "singlefile.html", write_fd) is None
+            assert provider.sendfile_artifact("req_missing_20250904_120000", "archive.wacz", write_fd) is None
+        finally:
+            os.close(read_fd)
+            os.close(write_fd)
+
+    def test_artifact_removed_after_scan(self, tmp_path):
+        """Test that artifact checks see files deleted since the last scan."""
+        request_dir = "example_com/home_page/req_test-1_20250904_120000"
+        snapshot_id = "req_test-1_20250904_120000"
+        write_tree(tmp_path, [
+            (f"{request_dir}/metadata.json", _EXAMPLE_METADATA),
+            (f"{request_dir}/screenshot.png", b"fake image data"),
+        ])
+        provider = FilesystemStorageProvider(tmp_path)
+        assert provider.artifact_exists(snapshot_id, "screenshot.png")
+        
+        os.remove(tmp_path / request_dir / "screenshot.png")
+        assert not provider.artifact_exists(snapshot_id, "screenshot.png")
+        assert provider.get_artifact_path(snapshot_id, "screenshot.png") is None
+        assert provider.get_artifact_stream(snapshot_id, "screenshot.png") is None
+
     def test_snapshot_pydantic_model(self, temp_archives):
         """Test that snapshots are properly created as Pydantic models."""
         provider = FilesystemStorageProvider(temp_archives)
@@ -132,51 +199,194 @@ class TestFilesystemStorageProvider:
         assert snapshot.title == "Example Domain"
         assert "archive.wacz" in snapshot.available_artifacts
         assert "screenshot.png" in snapshot.available_artifacts
+        assert snapshot.etag().startswith('W/"')
+        assert snapshot.last_modified() is not None
+
+    def test_snapshot_etag_tracks_metadata(self, tmp_path):
+        """Test that rewriting metadata.json in place changes the snapshot ETag."""
+        request_dir = "example_com/home_page/req_test-1_20250904_120000"
+        metadata_path = tmp_path / request_dir / "metadata.json"
+        write_tree(tmp_path, [(f"{request_dir}/metadata.json", _EXAMPLE_METADATA)])
+        
+        snapshot = FilesystemStorageProvider(tmp_path).get_snapshot_by_id("req_test-1_20250904_120000")
+        st = os.stat(metadata_path)
+        assert snapshot._stat_cache[1:] == (st.st_size, st.st_ino)
         
+        # Same inode and directory mtime, new contents
+        write_tree(tmp_path, [(f"{request_dir}/metadata.json", {**_EXAMPLE_METADATA, "title": "Changed"})])
+        rescanned = FilesystemStorageProvider(tmp_path).get_snapshot_by_id("req_test-1_20250904_120000")
+        assert rescanned.title == "Changed"
+        assert rescanned.etag() != snapshot.etag()
+
+    def test_nonexistent_storage_path(self, tmp_path):
+        """Test scanning a missing or non-directory storage path."""
+        assert FilesystemStorageProvider(tmp_path / "missing").get_all_urls() == {}
+
+        not_a_dir = tmp_path / "archives.txt"
+        not_a_dir.write_bytes(b"")
+        assert FilesystemStorageProvider(not_a_dir).get_all_urls() == {}
+
+    def test_scan_timeout(self, temp_archives):
+        """Test that an exhausted timeout still returns a (partial) result dict."""
+        provider = FilesystemStorageProvider(temp_archives, timeout_seconds=1e-9)
+        urls = provider.get_all_urls()
+        assert isinstance(urls, dict)
+
+        provider = FilesystemStorageProvider(temp_archives, timeout_seconds=0)
+        assert len(provider.get_all_urls()) == 1
+
+    def test_invalid_request_folders_skipped(self, tmp_path):
+        """Test that folders without a request timestamp are ignored."""
+        path_dir = tmp_path / "example_com" / "home_page"
+        (path_dir / "req_test-1_20250904_120000").mkdir(parents=True)
+        (path_dir / "req_no_timestamp").mkdir()
+        (path_dir / "invalid_timestamp_format").mkdir()
+        (path_dir / "req_file-1_20250904_120000").write_bytes(b"not a directory")
+
+        provider = FilesystemStorageProvider(tmp_path)
+        urls = provider.get_all_urls()
+
+        snapshots = urls["example_com_home_page"].snapshots
+        assert [s.snapshot_id for s in snapshots] == ["req_test-1_20250904_120000"]
+
+    def test_request_folder_without_id(self, tmp_path):
+        """Test that a request folder with only a timestamp after req_ is scanned."""
+        path_dir = tmp_path / "example_com" / "home_page"
+        (path_dir / "req_20250904_120000").mkdir(parents=True)
+
+        provider = FilesystemStorageProvider(tmp_path)
+        snapshots = provider.get_all_urls()["example_com_home_page"].snapshots
+        assert [s.snapshot_id for s in snapshots] == ["req_20250904_120000"]
+        assert snapshots[0].timestamp == datetime(2025, 9, 4, 12, 0, 0)
+
+    def test_fallback_to_mtime(self, tmp_path):
+        """Test that request folders without a timestamp use the directory mtime."""
+        path_dir = tmp_path / "example_com" / "home_page"
+        (path_dir / "req_no_timestamp").mkdir(parents=True)
+        (path_dir / "invalid_timestamp_format").mkdir()
+
+        provider = FilesystemStorageProvider(tmp_path, fallback_to_mtime=True)
+        urls = provider.get_all_urls()
+
+        snapshots = urls["example_com_home_page"].snapshots
+        assert [s.snapshot_id for s in snapshots] == ["req_no_timestamp"]
+        assert isinstance(snapshots[0].timestamp, datetime)
+
+    def test_parse_metadata_json(self, temp_archives, tmp_path):
+        """Test metadata parsing for valid, corrupt and missing files."""
+        provider = FilesystemStorageProvider(temp_archives)
+        request_dir = temp_archives / "example_com" / "home_page" / "req_test-1_20250904_120000"
+
+        metadata = provider._parse_metadata_json(request_dir / "metadata.json")
+        assert metadata["title"] == "Example Domain"
+
+        # Large enough to take the mmap path
+        large_path = tmp_path / "large.json"
+        large_path.write_bytes(dump_json({"title": "Large", "notes": "x" * (128 * 1024)}))
+        assert provider._parse_metadata_json(large_path)["title"] == "Large"
+
+        corrupt_path = tmp_path / "corrupt.json"
+        corrupt_path.write_bytes(b"{not valid json")
+        assert provider._parse_metadata_json(corrupt_path) == {}
+
+        oversized_path = tmp_path / "oversized.json"
+        oversized_path.write_bytes(b"{}" + b" " * (1 << 20))
+        assert provider._parse_metadata_json(oversized_path) == {}
+
+        assert provider._parse_metadata_json(request_dir / "missing.json") == {}
+
+    def test_metadata_cache(self, temp_archives):
+        """Test metadata cache reuse and invalidation."""
+        provider = FilesystemStorageProvider(temp_archives)
+        request_dir = temp_archives / "example_com" / "home_page" / "req_test-1_20250904_120000"
+        metadata_path = request_dir / "metadata.json"
+
+        first = provider._parse_metadata_json(metadata_path)
+        assert len(provider._metadata_cache) == 1
+
+        # Cache hits hand out fresh objects, so mutating one result (even a
+        # nested value) must not show up in later ones
+        cached = provider._parse_metadata_json(metadata_path)
+        assert cached == first
+        assert cached is not first
+        cached["archive_info"]["url"] = "https://mutated.example"
+        assert provider._parse_metadata_json(metadata_path) == first
+
+        provider.invalidate(request_dir)
+        assert len(provider._metadata_cache) == 0
+        second = provider._parse_metadata_json(metadata_path)
+        assert second == first
+        assert second is not first
+
+    def test_cache_pruned_after_scan(self, tmp_path):
+        """Test that a complete scan drops cache entries for vanished snapshots."""
+        path_dir = "example_com/home_page"
+        write_tree(tmp_path, [
+            (f"{path_dir}/req_test-1_20250904_120000/metadata.json", _EXAMPLE_METADATA),
+            (f"{path_dir}/req_test-2_20250905_120000/metadata.json", _EXAMPLE_METADATA),
+        ])
+        provider = FilesystemStorageProvider(tmp_path)
+        provider._scan_storage()
+        assert len(provider._artifact_cache) == 2
+        assert len(provider._metadata_cache) == 2
+
+        shutil.rmtree(tmp_path / path_dir / "req_test-2_20250905_120000")
+        provider._scan_storage()
+        assert list(provider._artifact_cache) == [str(tmp_path / path_dir / "req_test-1_20250904_120000")]
+        assert len(provider._metadata_cache) == 1
+
+    def test_rescan_hits_cache(self, tmp_path):
+        """Test that a rescan reuses cached metadata for every snapshot."""
+        write_tree(tmp_path, [
+            (f"example_com/page_{i:02d}/req_test-{i}_20250904_120000/metadata.json", _EXAMPLE_METADATA)
+            for i in range(20)
+        ])
+        provider = FilesystemStorageProvider(tmp_path)
+        provider.get_all_urls()
+        assert len(provider._metadata_cache) == 20
+        
+        with patch.object(os, "read", wraps=os.read) as read:
+            assert len(provider.get_all_urls()) == 20
+        assert read.call_count == 0
+
+    def test_parse_timestamp(self, temp_archives):
+        """Test timestamp parsing for request and legacy folder names."""
+        provider = FilesystemStorageProvider(temp_archives)
+        expected = datetime(2025, 9, 4, 6, 14, 11)
+
+        assert provider._parse_timestamp("req_test-request-1_20250904_061411") == expected
+        assert provider._parse_timestamp("req_with_underscores_20250904_061411") == expected
+        assert provider._parse_timestamp("20250904T061411Z") == expected
+        assert provider._parse_timestamp("20250904_061411") == expected
+        assert provider._parse_timestamp("2025-09-04_06-14-11") == expected
+
+        assert provider._parse_timestamp("req_test-1_20251304_061411") is None
+        assert provider._parse_timestamp("req_no_timestamp") is None
+        assert provider._parse_timestamp("invalid_timestamp_format") is None
+        
+        # Compact and dashed layouts are all-or-nothing, and only request
+        # folders may carry a prefix before the timestamp
+        assert provider._parse_timestamp("2025-0904_061411") is None
+        assert provider._parse_timestamp("20250904_06-1411") is None
+        assert provider._parse_timestamp("2025-09-04T06-14-11Z") is None
+        assert provider._parse_timestamp("20250904T061411") is None
+        assert provider._parse_timestamp("foo_20250904_061411") is None
+
 
 class TestStorageService:
     """Test cases for StorageService layer."""
     
-    @pytest.fixture
-    def temp_archives(self):
-        """Create temporary archives directory with test data."""
-        with tempfile.TemporaryDirectory() as temp_dir:
-            archives_path = Path(temp_dir) / "archives"
-            archives_path.mkdir()
-            
-            # Create multiple domains and URLs for testing
-            for domain in ["example_com", "test_org"]:
-                domain_dir = archives_path / domain
-                domain_dir.mkdir()
-                
-                path_dir = domain_dir / "home_page"
-                path_dir.mkdir()
-                
-                request_dir = path_dir / f"req_{domain}_20250904_120000"
-                request_dir.mkdir()
-                
-                metadata = {
-                    "archive_info": {
-                        "url": f"https://{domain.replace('_', '.')}",
-                        "request_id": domain
-                    }
-                }
-                with open(request_dir / "metadata.json", "w") as f:
-                    json.dump(metadata, f)
-            
-            yield archives_path
-
-    def test_service_initialization(self, temp_archives):
+    def test_service_initialization(self, service_archives):
         """Test service initialization with provider."""
-        provider = FilesystemStorageProvider(temp_archives)
+        provider = FilesystemStorageProvider(service_archives)
         service = StorageService(provider, cache_ttl_seconds=30)
         
         assert service.provider == provider
         assert service.cache_ttl_seconds == 30
 
-    def test_service_caching(self, temp_archives):
+    def test_service_caching(self, service_archives):
         """Test service caching functionality."""
-        provider = FilesystemStorageProvider(temp_archives)
+        provider = FilesystemStorageProvider(service_archives)
         service = StorageService(provider, cache_ttl_seconds=60)
         
         # First call should populate cache
@@ -192,9 +402,9 @@ class TestStorageService:
         assert stats["cached_urls_count"] == 2
         assert stats["ttl_seconds"] == 60
 
-    def test_service_cache_disabled(self, temp_archives):
+    def test_service_cache_disabled(self, service_archives):
         """Test service with caching disabled."""
-        provider = FilesystemStorageProvider(temp_archives)
+        provider = FilesystemStorageProvider(service_archives)
         service = StorageService(provider, cache_ttl_seconds=0)
         
         urls = service.get_all_urls()
@@ -203,6 +413,157 @@ class TestStorageService:
         stats = service.get_cache_stats()
         assert stats["cache_disabled"] is True
 
+    def test_service_get_page(self, service_archives):
+        """Test sorted, paginated URL access through the service."""
+        provider = FilesystemStorageProvider(service_archives)
+        service = StorageService(provider, cache_ttl_seconds=60)
+        
+        page_urls, total_count = service.get_page(1, 1, "url")
+        assert total_count == 2
+        assert [u.url_id for u in page_urls] == ["example_com_home_page"]
+        
+        page_urls, _ = service.get_page(2, 1, "url")
+        assert [u.url_id for u in page_urls] == ["test_org_home_page"]
+        assert service._sorted_urls["url"][1] is page_urls[0]
+        
+        page_urls, total_count = service.get_page(3, 1, "snapshot_count")
+        assert page_urls == []
+        assert total_count == 2
+        
+        with pytest.raises(StorageError):
+            service.get_page(1, 1, "unknown")
+        
+        # With caching disabled pages are selected while streaming from the provider
+        uncached = StorageService(FilesystemStorageProvider(service_archives), cache_ttl_seconds=0)
+        for sort in ("url", "last_captured", "snapshot_count"):
+            for page in (1, 2, 3):
+                cached_page, cached_total = service.get_page(page, 1, sort)
+                streamed_page, streamed_total = uncached.get_page(page, 1, sort)
+                assert [u.url_id for u in streamed_page] == [u.url_id for u in cached_page]
+                assert streamed_total == cached_total
+
+    def test_service_get_page_ties(self, tmp_path):
+        """Test that URLs tying on every sort key are paged without repeats or gaps."""
+        url_ids = [f"site{i:02d}_com_home" for i in range(12)]
+        write_tree(tmp_path, [
+            (f"site{i:02d}_com/home/req_test-{i}_20250904_120000/metadata.json", _EXAMPLE_METADATA)
+            for i in range(12)
+        ])
+        
+        for ttl in (60, 0):
+            service = StorageService(FilesystemStorageProvider(tmp_path), cache_ttl_seconds=ttl)
+            for sort in ("url", "last_captured", "snapshot_count"):
+                pages = []
+                for page in (1, 2, 3):
+                    page_urls, total_count = service.get_page(page, 5, sort)
+                    assert total_count == 12
+                    pages.extend(u.url_id for u in page_urls)
+                    service.clear_cache()
+                assert sorted(pages) == url_ids
+                assert [u.url_id for u in service.get_page(1, 12, sort)[0]] == pages
+
+    def test_service_streamed_page_refreshes_provider(self, tmp_path):
+        """Test that a streamed page (caching disabled) updates provider indexes and stats."""
+        path_dir = "example_com/home_page"
+        write_tree(tmp_path, [
+            (f"{path_dir}/req_test-1_20250904_120000/metadata.json", _SERVICE_METADATA["example_com"]),
+        ])
+        provider = FilesystemStorageProvider(tmp_path)
+        service = StorageService(provider, cache_ttl_seconds=0)
+        
+        service.get_page(1, 10, "url")
+        assert provider.get_snapshot_by_id("req_test-1_20250904_120000") is not None
+        assert service.get_cache_stats()["cached_urls_count"] == 1
+        
+        # New snapshots show up in the provider's indexes after the next page
+        write_tree(tmp_path, [
+            (f"{path_dir}/req_test-2_20250905_120000/screenshot.png", b"png"),
+            ("test_org/home_page/req_test-3_20250906_120000/metadata.json", _SERVICE_METADATA["test_org"]),
+        ])
+        shutil.rmtree(tmp_path / path_dir / "req_test-1_20250904_120000")
+        page_urls, total_count = service.get_page(1, 1, "url")
+        assert total_count == 2
+        assert provider.get_snapshot_by_id("req_test-1_20250904_120000") is None
+        assert provider.get_snapshot_by_id("req_test-3_20250906_120000") is not None
+        assert [s.snapshot_id for s in provider.get_snapshots_with_artifact("screenshot.png")] == [
+            "req_test-2_20250905_120000"
+        ]
+        assert service.get_cache_stats()["cached_urls_count"] == 2
+        
+        # The complete streamed scan also pruned the removed snapshot's cache entries
+        assert str(tmp_path / path_dir / "req_test-1_20250904_120000") not in provider._artifact_cache
+
+    def test_service_skips_rescan_when_unchanged(self, tmp_path):
+        """Test that an expired cache is kept when the change token is unchanged."""
+        path_dir = "example_com/home_page"
+        write_tree(tmp_path, [
+            (f"{path_dir}/req_test-1_20250904_120000/metadata.json", _SERVICE_METADATA["example_com"]),
+        ])
+        provider = FilesystemStorageProvider(tmp_path)
+        service = StorageService(provider, cache_ttl_seconds=60)
+        
+        with patch.object(provider, "get_all_urls", wraps=provider.get_all_urls) as scan:
+            urls1 = service.get_all_urls()
+            service._cache_timestamp = 0.0  # Force TTL expiry
+            assert service.get_all_urls() is urls1
+            assert scan.call_count == 1
+            
+            # A new snapshot changes the token and triggers a rescan
+            write_tree(tmp_path, [
+                (f"{path_dir}/req_test-2_20250905_120000/metadata.json", _SERVICE_METADATA["example_com"]),
+            ])
+            service._cache_timestamp = 0.0
+            urls2 = service.get_all_urls()
+            assert scan.call_count == 2
+            assert urls2["example_com_home_page"].snapshot_count == 2
+            
+            # With caching disabled every call rescans, so no token is computed
+            uncached = StorageService(provider, cache_ttl_seconds=0)
+            with patch.object(provider, "get_change_token", wraps=provider.get_change_token) as token:
+                uncached.get_all_urls()
+                uncached.get_all_urls()
+            assert token.call_count == 0
+            assert scan.call_count == 4
+
+    def test_change_token_tracks_metadata_rewrites(self, tmp_path):
+        """Test that rewriting metadata.json in place invalidates the cached URLs."""
+        request_dir = "example_com/home_page/req_test-1_20250904_120000"
+        metadata_path = tmp_path / request_dir / "metadata.json"
+        write_tree(tmp_path, [(f"{request_dir}/metadata.json", {**_EXAMPLE_METADATA, "title": "Old"})])
+        provider = FilesystemStorageProvider(tmp_path)
+        service = StorageService(provider, cache_ttl_seconds=60)
+        assert service.get_url_by_id("example_com_home_page").snapshots[0].title == "Old"
+        
+        # Rewrite in place; the directory mtimes stay the same
+        st = os.stat(metadata_path)
+        write_tree(tmp_path, [(f"{request_dir}/metadata.json", {**_EXAMPLE_METADATA, "title": "New"})])
+        os.utime(metadata_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        service._cache_timestamp = 0.0  # Force TTL expiry
+        assert service.get_url_by_id("example_com_home_page").snapshots[0].title == "New"
+        
+        # A token walk that runs out of time reports "unknown" rather than a partial token
+        with patch.object(provider, "_check_timeout", return_value=True):
+            assert provider.get_change_token() is None
+
+    def test_service_rescans_after_timed_out_scan(self, tmp_path):
+        """Test that a partial scan is not kept alive by the change token."""
+        write_tree(tmp_path, [
+            (f"{domain}/home_page/req_test-1_20250904_120000/metadata.json", metadata)
+            for domain, metadata in _SERVICE_METADATA.items()
+        ])
+        provider = FilesystemStorageProvider(tmp_path)
+        service = StorageService(provider, cache_ttl_seconds=60)
+        
+        with patch.object(provider, "_check_timeout", return_value=True):
+            assert service.get_all_urls() == {}
+        assert not provider.is_scan_complete()
+        assert service._change_token is None
+        
+        service._cache_timestamp = 0.0  # Force TTL expiry
+        assert len(service.get_all_urls()) == 2
+        assert provider.is_scan_complete()
+        assert service._change_token is not None
+
 
 class TestStorageFactory:
     """Test cases for storage factory functions."""
@@ -214,7 +575,9 @@ class TestStorageFactory:
                 "type": "filesystem",
                 "filesystem": {
                     "path": "/tmp/test",
-                    "timeout_seconds": 15
+                    "timeout_seconds": 15,
+                    "scan_workers": 2,
+                    "scan_cache_max_entries": 500
                 }
             }
         }
@@ -223,6 +586,8 @@ class TestStorageFactory:
         assert isinstance(provider, FilesystemStorageProvider)
         assert str(provider.storage_path).endswith("test")
         assert provider.timeout_seconds == 15
+        assert provider.workers == 2
+        assert provider.cache_max_entries == 500
 
     def test_create_storage_service(self):
         """Test creating storage service via factory."""
@@ -3,52 +3,38 @@ Integration tests for URLs API endpoint with storage architecture.
 """
 
 import pytest
-import tempfile
-import json
-from pathlib import Path
 from unittest.mock import patch
 from fastapi.testclient import TestClient
 from datetime import datetime
 
 from app.main import app
+from tests.helpers import write_tree
 
 # Create test client
 client = TestClient(app)
 
 
-@pytest.fixture
-def temp_archives():
-    """Create temporary archives directory with test data."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        archives_path = Path(temp_dir) / "archives"
-        archives_path.mkdir()
-        
-        # Create test structure: archives/domain/path/req_id_timestamp/
-        domain_dir = archives_path / "example_com"
-        domain_dir.mkdir()
-        
-        path_dir = domain_dir / "home_page"
-        path_dir.mkdir()
-        
-        request_dir = path_dir / "req_test-1_20250904_120000"
-        request_dir.mkdir()
-        
-        # Create metadata.json
-        metadata = {
-            "archive_info": {
-                "url": "https://example.com",
-                "request_id": "test-1"
-            },
-            "title": "Example Domain"
-        }
-        with open(request_dir / "metadata.json", "w") as f:
-            json.dump(metadata, f)
-        
-        # Create artifacts
-        (request_dir / "archive.wacz").write_bytes(b"fake wacz data")
-        (request_dir / "screenshot.png").write_bytes(b"fake image data")
-        
-        yield str(archives_path)
+@pytest.fixture(scope="module")
+def temp_archives(tmp_path_factory):
+    """Create temporary archives directory with test data (read-only, shared by the module)."""
+    archives_path = tmp_path_factory.mktemp("archives")
+    
+    # Create test structure: archives/domain/path/req_id_timestamp/
+    request_dir = "example_com/home_page/req_test-1_20250904_120000"
+    metadata = {
+        "archive_info": {
+            "url": "https://example.com",
+            "request_id": "test-1"
+        },
+        "title": "Example Domain"
+    }
+    write_tree(archives_path, [
+        (f"{request_dir}/metadata.json", metadata),
+        (f"{request_dir}/archive.wacz", b"fake wacz data"),
+        (f"{request_dir}/screenshot.png", b"fake image data"),
+    ])
+    
+    return str(archives_path)
 
 
 class TestUrlsAPIIntegration: